@@ -7,16 +7,134 @@ actionable insights about traffic patterns, regional variations, and infrastruct
 """
 
 import argparse
+import hashlib
+import joblib
 import pandas as pd
 import numpy as np
 from pathlib import Path
 
 
-def load_raw(filename):
-    """Load raw NVDB traffic data"""
-    raw_path = Path(__file__).resolve().parents[2] / "data" / "raw" / filename
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# On-disk cache for processed metrics, keyed on the raw file's mtime and size
+_memory = joblib.Memory(location=PROJECT_ROOT / ".cache", verbose=0)
+
+# Fingerprint of this module's source so pipeline edits invalidate cached metrics
+_PIPELINE_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+SEASONS = ["Winter", "Spring", "Summer", "Autumn"]
+
+# Raw columns needed to build the monthly metrics
+RAW_METRIC_COLUMNS = ["date", "value", "region", "road_category"]
+
+# Storage dtypes for the processed metrics (values are rounded to 1 decimal)
+COMPACT_DTYPES = {
+    "region": "category",
+    "road_category": "category",
+    "traffic_max": "float32",
+    "traffic_count": "int32",
+    "traffic_mean": "float32",
+    "monthly_change_mean": "float32",
+    "rolling_3m_avg": "float32",
+    "yoy_change": "float32",
+    "year": "int16",
+    "month": "int8",
+    "covid_period": "int8",
+}
+
+# Bit i set for each month i in the March-September 2020 COVID window
+_COVID_MONTH_MASK = np.uint16(0b0000_0011_1111_1000)
+
+# Start of the COVID period, end of the COVID period and start of recovery
+_COVID_BOUNDARIES = np.array(["2020-03-01", "2020-10-01", "2021-01-01"], dtype="datetime64[D]")
+
+# Season category code for each month (index 0 = January)
+_SEASON_CODES = np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0], dtype=np.int8)
+
+
+def load_raw(filename, columns=None):
+    """Load raw NVDB traffic data, optionally restricted to ``columns``"""
+    raw_path = PROJECT_ROOT / "data" / "raw" / filename
     print(f"Processing NVDB traffic data from {raw_path}")
-    return pd.read_csv(raw_path)
+    
+    # Low-cardinality grouping keys hash much faster as categoricals
+    return pd.read_csv(
+        raw_path,
+        usecols=columns,
+        dtype={"region": "category", "road_category": "category"},
+        parse_dates=["date"],
+        date_format="%Y-%m-%d"
+    )
+
+
+def season_from_month(month):
+    """Map month numbers (1-12) to a categorical season column"""
+    codes = _SEASON_CODES[month.to_numpy() - 1]
+    return pd.Categorical.from_codes(codes, categories=SEASONS)
+
+
+def _round_float_columns(df, decimals=1):
+    """Round all float columns with a single NumPy pass over the block"""
+    float_cols = df.select_dtypes("floating").columns
+    df[float_cols] = np.round(df[float_cols].to_numpy(dtype=np.float64), decimals)
+    return df
+
+
+def _sorted_segments(dates, *group_keys):
+    """Return the date-sorted row order and segment start flags for integer ``group_keys``"""
+    order = np.lexsort((dates, *reversed(group_keys)))
+    starts = np.empty(len(order), dtype=bool)
+    starts[:1] = True
+    starts[1:] = False
+    for key in group_keys:
+        sorted_key = key[order]
+        starts[1:] |= sorted_key[1:] != sorted_key[:-1]
+    return order, starts
+
+
+def _classify(values, edges, labels):
+    """Bucket values into ordered categories, with each bin closed on the right"""
+    codes = np.searchsorted(edges, values, side="left").astype(np.int8)
+    codes[np.isnan(values)] = -1
+    return pd.Categorical.from_codes(codes, categories=labels, ordered=True)
+
+
+def _segment_pct_change(values, order, starts):
+    """Percentage change from the previous row within each sorted series"""
+    ordered = values[order].astype(np.float64)
+    change = np.empty_like(ordered)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change[1:] = (ordered[1:] / ordered[:-1] - 1) * 100
+    change[starts] = np.nan
+    
+    result = np.empty_like(change)
+    result[order] = change
+    return result
+
+
+def _segment_centered_mean(values, order, starts, window=3):
+    """Centered rolling mean within each sorted series (NaN where the window is incomplete)"""
+    ordered = values[order].astype(np.float64)
+    half = window // 2
+    positions = np.arange(len(ordered))
+    offset = positions - np.maximum.accumulate(np.where(starts, positions, 0))
+    segment_ids = np.cumsum(starts) - 1
+    remaining = np.bincount(segment_ids)[segment_ids] - offset - 1
+    
+    # Running sums skip NaNs so a missing value only affects the windows containing it
+    missing = np.isnan(ordered)
+    cumulative = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, ordered))))
+    cumulative_missing = np.concatenate(([0], np.cumsum(missing)))
+    
+    valid = np.flatnonzero((offset >= half) & (remaining >= half))
+    valid = valid[cumulative_missing[valid + half + 1] == cumulative_missing[valid - half]]
+    rolling = np.full_like(ordered, np.nan)
+    rolling[valid] = (cumulative[valid + half + 1] - cumulative[valid - half]) / window
+    
+    result = np.empty_like(rolling)
+    result[order] = rolling
+    return result
 
 
 def build_traffic_metrics(df):
@@ -36,26 +154,21 @@ def build_traffic_metrics(df):
     Returns:
         pd.DataFrame: Processed monthly metrics with regional analysis
     """
-    # Data preparation
-    df["date"] = pd.to_datetime(df["date"])
-    df["year"] = df["date"].dt.year
-    df["month"] = df["date"].dt.month
-    df["season"] = df["month"].map({
-        12: "Winter", 1: "Winter", 2: "Winter",
-        3: "Spring", 4: "Spring", 5: "Spring", 
-        6: "Summer", 7: "Summer", 8: "Summer",
-        9: "Autumn", 10: "Autumn", 11: "Autumn"
-    })
-    
     # Group by date, region, and road category for comprehensive analysis
-    monthly = df.groupby(["date", "region", "road_category"]).agg({
+    monthly = df.groupby(["date", "region", "road_category"], observed=True).agg({
         "value": ["sum", "mean", "max", "count"]
-    }).round(1)
+    })
     monthly.columns = ["traffic_sum", "traffic_mean", "traffic_max", "traffic_count"]
-    monthly = monthly.reset_index()
+    monthly = _round_float_columns(monthly.reset_index())
+    
+    # Hash the region/road series once and reuse the ids for every window metric
+    traffic_mean = monthly["traffic_mean"].to_numpy()
+    dates = monthly["date"].to_numpy()
+    series_ids = monthly.groupby(["region", "road_category"], observed=True, sort=False).ngroup().to_numpy()
+    order, starts = _sorted_segments(dates, series_ids)
     
     # Calculate monthly changes (period-over-period growth)
-    monthly["monthly_change_mean"] = monthly.groupby(["region", "road_category"])["traffic_mean"].pct_change() * 100
+    monthly["monthly_change_mean"] = _segment_pct_change(traffic_mean, order, starts)
     monthly["monthly_change_mean"] = monthly["monthly_change_mean"].fillna(0).round(1)
     
     # Add date components first
@@ -63,57 +176,74 @@ def build_traffic_metrics(df):
     monthly["month"] = monthly["date"].dt.month
     
     # Calculate rolling averages for trend smoothing
-    monthly["rolling_3m_avg"] = monthly.groupby(["region", "road_category"])["traffic_mean"].transform(lambda x: x.rolling(window=3, center=True).mean()).round(1)
+    monthly["rolling_3m_avg"] = _segment_centered_mean(traffic_mean, order, starts, window=3).round(1)
     
     # Year-over-year comparison for same month in previous year
-    monthly["yoy_change"] = monthly.groupby(["region", "road_category", "month"])["traffic_mean"].pct_change(periods=1) * 100
+    yoy_order, yoy_starts = _sorted_segments(dates, series_ids, monthly["month"].to_numpy())
+    monthly["yoy_change"] = _segment_pct_change(traffic_mean, yoy_order, yoy_starts)
     monthly["yoy_change"] = monthly["yoy_change"].fillna(0).round(1)
-    monthly["season"] = monthly["month"].map({
-        12: "Winter", 1: "Winter", 2: "Winter",
-        3: "Spring", 4: "Spring", 5: "Spring", 
-        6: "Summer", 7: "Summer", 8: "Summer",
-        9: "Autumn", 10: "Autumn", 11: "Autumn"
-    })
+    monthly["season"] = season_from_month(monthly["month"])
     
     # Traffic volume classification
-    monthly["volume_classification"] = monthly["traffic_mean"].apply(lambda x:
-        "Very High" if x > 50000 else
-        "High" if x > 40000 else
-        "Moderate" if x > 30000 else
-        "Low" if x > 20000 else
-        "Very Low"
+    monthly["volume_classification"] = _classify(
+        traffic_mean,
+        edges=[20000, 30000, 40000, 50000],
+        labels=["Very Low", "Low", "Moderate", "High", "Very High"]
     )
     
     # COVID-19 impact period identification (2020 Q2-Q3)
-    monthly["covid_period"] = ((monthly["year"] == 2020) & 
-                              (monthly["month"].isin([3, 4, 5, 6, 7, 8, 9]))).astype(int)
+    months = monthly["month"].to_numpy(dtype=np.uint16)
+    in_covid_months = (_COVID_MONTH_MASK >> months) & 1
+    monthly["covid_period"] = (in_covid_months & (monthly["year"].to_numpy() == 2020)).astype(np.int8)
     
     # Recovery trend classification
-    monthly["recovery_trend"] = monthly["monthly_change_mean"].apply(lambda x:
-        "Strong Recovery" if x > 10 else
-        "Moderate Recovery" if x > 5 else
-        "Stable" if x > -5 else
-        "Declining" if x > -15 else
-        "Sharp Decline"
+    monthly["recovery_trend"] = _classify(
+        monthly["monthly_change_mean"].to_numpy(),
+        edges=[-15, -5, 5, 10],
+        labels=["Sharp Decline", "Declining", "Stable", "Moderate Recovery", "Strong Recovery"]
     )
     
-    return monthly
+    # Downcast to compact dtypes for storage and plotting
+    return monthly.astype(COMPACT_DTYPES)
+
+
+@_memory.cache(ignore=["df_raw"])
+def _cached_traffic_metrics(filename, mtime_ns, size, pipeline_version, df_raw=None):
+    if df_raw is None:
+        df_raw = load_raw(filename, columns=RAW_METRIC_COLUMNS)
+    return build_traffic_metrics(df_raw)
+
+
+def load_traffic_metrics(filename, df_raw=None):
+    """
+    Build traffic metrics for a raw file, reusing cached results while it is unchanged
+    
+    Args:
+        filename (str): Raw data file name in data/raw
+        df_raw (pd.DataFrame, optional): Already loaded raw data, used on a cache miss
+            instead of reading the file again
+    
+    Returns:
+        pd.DataFrame: Processed monthly metrics
+    """
+    stat = (PROJECT_ROOT / "data" / "raw" / filename).stat()
+    return _cached_traffic_metrics(filename, stat.st_mtime_ns, stat.st_size, _PIPELINE_VERSION, df_raw=df_raw)
 
 
 def calculate_regional_comparisons(df):
     """Calculate comprehensive regional traffic comparisons"""
-    regional_stats = df.groupby(["region", "road_category"]).agg({
+    regional_stats = df.groupby(["region", "road_category"], observed=True, sort=False).agg({
         "traffic_mean": ["mean", "std", "min", "max"],
         "monthly_change_mean": ["mean", "std"],
         "traffic_sum": ["sum", "count"]
-    }).round(1)
+    })
     
     # Flatten column names
     regional_stats.columns = [
         "avg_traffic", "std_traffic", "min_traffic", "max_traffic",
         "avg_growth", "std_growth", "total_traffic", "months_tracked"
     ]
-    regional_stats = regional_stats.reset_index()
+    regional_stats = _round_float_columns(regional_stats.reset_index())
     
     # Calculate efficiency metrics
     regional_stats["traffic_consistency"] = (1 - regional_stats["std_traffic"] / regional_stats["avg_traffic"]) * 100
@@ -124,9 +254,12 @@ def calculate_regional_comparisons(df):
 
 def covid_impact_analysis(df):
     """Analyze COVID-19 impact on traffic patterns"""
-    pre_covid = df[df["date"] < "2020-03-01"]["traffic_mean"].mean()
-    covid_period = df[(df["date"] >= "2020-03-01") & (df["date"] < "2020-10-01")]["traffic_mean"].mean()
-    post_covid = df[df["date"] >= "2021-01-01"]["traffic_mean"].mean()
+    # Bin every row once: 0 = pre-COVID, 1 = COVID period, 2 = late 2020, 3 = post-COVID
+    bins = np.searchsorted(_COVID_BOUNDARIES, df["date"].to_numpy("datetime64[D]"), side="right")
+    sums = np.bincount(bins, weights=df["traffic_mean"].to_numpy(), minlength=4)
+    counts = np.bincount(bins, minlength=4)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pre_covid, covid_period, _, post_covid = sums / counts
     
     covid_impact = {
         "pre_covid_avg": pre_covid,
@@ -142,8 +275,8 @@ def covid_impact_analysis(df):
 
 def save_processed(df, filename):
     """Save processed data and regional analysis"""
-    processed_path = Path(__file__).resolve().parents[2] / "data" / "processed" / filename
-    df.to_csv(processed_path, index=False)
+    processed_path = PROJECT_ROOT / "data" / "processed" / filename
+    df.to_parquet(processed_path, compression="zstd", index=False)
     print(f"Processed traffic data saved to {processed_path}")
     print(f"Dataset contains {len(df)} monthly records across {df['region'].nunique()} regions")
     return processed_path
@@ -161,22 +294,21 @@ def main():
         print("Loading and processing Norwegian road traffic data...")
     
     try:
-        # Load raw data
-        df_raw = load_raw("norwegian_traffic_nvdb.csv")
-        
+        df_raw = None
         if args.verbose:
+            df_raw = load_raw("norwegian_traffic_nvdb.csv")
             print(f"Raw data loaded: {len(df_raw)} records")
-            print(f"Date range: {df_raw['date'].min()} to {df_raw['date'].max()}")
+            print(f"Date range: {df_raw['date'].min():%Y-%m-%d} to {df_raw['date'].max():%Y-%m-%d}")
             print(f"Regions: {df_raw['region'].unique()}")
             print(f"Road categories: {df_raw['road_category'].unique()}")
             if 'road_number' in df_raw.columns:
                 print(f"Roads tracked: {df_raw['road_number'].unique()}")
         
-        # Process data
-        df_processed = build_traffic_metrics(df_raw)
+        # Process data (cached until the raw file changes)
+        df_processed = load_traffic_metrics("norwegian_traffic_nvdb.csv", df_raw=df_raw)
         
         # Save results
-        output_path = save_processed(df_processed, "traffic_insights_processed.csv")
+        output_path = save_processed(df_processed, "traffic_insights_processed.parquet")
         
         if args.verbose:
             print("\nProcessing Summary:")
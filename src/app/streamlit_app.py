@@ -10,7 +10,6 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
-import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from pathlib import Path
 import warnings
@@ -68,9 +67,37 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Dashboard COVID periods, in chronological order, and the dates separating them
+COVID_PERIODS = ['Pre-COVID', 'COVID Peak', 'COVID Decline', 'Recovery']
+COVID_START = pd.Timestamp('2020-03-01')
+COVID_PEAK = pd.Timestamp('2020-06-01')
+RECOVERY_START = pd.Timestamp('2021-01-01')
+
+@st.cache_data
+def read_processed_file(processed_path, modified_time):
+    """Read the processed Parquet file, cached per file modification time"""
+    return pd.read_parquet(processed_path)
+
 @st.cache_data
+def load_dashboard_stats(processed_path, modified_time):
+    """Compute every dashboard aggregate once per processed file version"""
+    df = read_processed_file(processed_path, modified_time)
+    df_analysis = label_covid_periods(df)
+    
+    stats = {
+        'covid_analysis': df_analysis,
+        'period_stats': compute_period_stats(df_analysis),
+        'period_kpis': compute_period_kpis(df_analysis),
+        'regional_stats': compute_regional_stats(df),
+    }
+    if 'road_category' in df.columns:
+        stats['road_stats'], stats['road_trends'] = compute_road_stats(df)
+    if 'season' in df.columns:
+        stats['seasonal_stats'], stats['monthly_pivot'] = compute_seasonal_stats(df)
+    return stats
+
 def load_processed_data():
-    """Load processed NVDB traffic data"""
+    """Load processed NVDB traffic data and its cached dashboard aggregates"""
     try:
         # Try multiple path configurations for local and Streamlit Cloud environments
         base_paths = [
@@ -80,24 +107,82 @@ def load_processed_data():
         ]
         
         for base_path in base_paths:
-            processed_path = base_path / "data" / "processed" / "traffic_insights_processed.csv"
+            processed_path = base_path / "data" / "processed" / "traffic_insights_processed.parquet"
             if processed_path.exists():
-                df = pd.read_csv(processed_path)
-                df["date"] = pd.to_datetime(df["date"])
+                modified_time = processed_path.stat().st_mtime_ns
+                df = read_processed_file(processed_path, modified_time)
+                stats = load_dashboard_stats(processed_path, modified_time)
                 st.success(f"✅ Data loaded from: {processed_path}")
-                return df
+                return df, stats
         
         # If no data file found, show error
         st.error("❌ Processed data not found. Please run: python -m src.analysis.prepare")
         st.info("💡 This will process the raw NVDB traffic data and generate analytics-ready metrics.")
-        return pd.DataFrame()
+        return pd.DataFrame(), {}
         
     except Exception as e:
         st.error(f"❌ Error loading data: {str(e)}")
         st.info("💡 Please ensure data processing is complete: python -m src.analysis.prepare")
-        return pd.DataFrame()
+        return pd.DataFrame(), {}
+
+def compute_period_stats(df_analysis):
+    """Average traffic per COVID period and region"""
+    return df_analysis.groupby(['covid_period', 'region'], observed=True)['traffic_mean'].mean().reset_index()
+
+def compute_period_kpis(df_analysis):
+    """Average traffic per COVID period across all regions"""
+    return df_analysis.groupby('covid_period', observed=True)['traffic_mean'].mean()
 
-def create_covid_impact_analysis(df):
+def compute_regional_stats(df):
+    """Traffic level, peak, variability and growth per region"""
+    regional_stats = df.groupby('region', observed=True).agg({
+        'traffic_mean': ['mean', 'max', 'std'],
+        'monthly_change_mean': 'mean'
+    }).round(1)
+    
+    regional_stats.columns = ['avg_traffic', 'peak_traffic', 'variability', 'avg_growth']
+    return regional_stats.reset_index()
+
+def compute_road_stats(df):
+    """Average traffic per road category, overall and per month"""
+    road_stats = df.groupby('road_category', observed=True)['traffic_mean'].mean().reset_index()
+    road_trends = df.groupby(['date', 'road_category'], observed=True)['traffic_mean'].mean().reset_index()
+    return road_stats, road_trends
+
+def compute_seasonal_stats(df):
+    """Average traffic per season and region, plus per month and region when available"""
+    seasonal_stats = df.groupby(['season', 'region'], observed=True)['traffic_mean'].mean().reset_index()
+    monthly_pivot = None
+    if 'month' in df.columns:
+        monthly_pivot = compute_month_region_means(df)
+    return seasonal_stats, monthly_pivot
+
+def compute_month_region_means(df):
+    """Month x region grid of average traffic, accumulated in a single pass"""
+    regions = df['region'].cat.categories
+    cells = (df['month'].to_numpy(dtype=np.intp) - 1) * len(regions) + df['region'].cat.codes.to_numpy()
+    sums = np.bincount(cells, weights=df['traffic_mean'].to_numpy(), minlength=12 * len(regions))
+    counts = np.bincount(cells, minlength=12 * len(regions))
+    
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (sums / counts).reshape(12, len(regions))
+    
+    observed = counts.reshape(12, len(regions)) > 0
+    grid = pd.DataFrame(means, index=pd.RangeIndex(1, 13, name='month'), columns=regions.rename('region'))
+    return grid.loc[observed.any(axis=1), observed.any(axis=0)]
+
+def label_covid_periods(df):
+    """Label each row with its COVID period"""
+    # Categorize data by COVID periods with one binary search over the dates
+    boundaries = np.array([COVID_START, COVID_PEAK, RECOVERY_START], dtype='datetime64[ns]')
+    period_codes = np.searchsorted(boundaries, df['date'].to_numpy('datetime64[ns]'), side='right')
+    covid_period = pd.Categorical.from_codes(period_codes, categories=COVID_PERIODS)
+    
+    # Attach the labels to a narrow copy of the three columns used by the COVID section
+    # instead of copying the whole frame
+    return df[['date', 'region', 'traffic_mean']].assign(covid_period=covid_period)
+
+def create_covid_impact_analysis(df, stats):
     """Analyze COVID-19 impact on traffic patterns"""
     st.subheader("🦠 COVID-19 Impact Analysis")
     
@@ -105,24 +190,13 @@ def create_covid_impact_analysis(df):
         st.warning("No data available for COVID impact analysis")
         return
     
-    # Define COVID periods
-    covid_start = pd.Timestamp('2020-03-01')
-    covid_peak = pd.Timestamp('2020-06-01')
-    recovery_start = pd.Timestamp('2021-01-01')
-    
-    # Categorize data by COVID periods
-    df_analysis = df.copy()
-    df_analysis['covid_period'] = 'Normal'
-    df_analysis.loc[df_analysis['date'] < covid_start, 'covid_period'] = 'Pre-COVID'
-    df_analysis.loc[(df_analysis['date'] >= covid_start) & (df_analysis['date'] < covid_peak), 'covid_period'] = 'COVID Peak'
-    df_analysis.loc[(df_analysis['date'] >= covid_peak) & (df_analysis['date'] < recovery_start), 'covid_period'] = 'COVID Decline'
-    df_analysis.loc[df_analysis['date'] >= recovery_start, 'covid_period'] = 'Recovery'
+    df_analysis = stats['covid_analysis']
     
     col1, col2 = st.columns(2)
     
     with col1:
         # Traffic volume by COVID period
-        period_stats = df_analysis.groupby(['covid_period', 'region'])['traffic_mean'].mean().reset_index()
+        period_stats = stats['period_stats']
         
         fig1 = px.bar(period_stats, 
                      x='covid_period', 
@@ -145,9 +219,9 @@ def create_covid_impact_analysis(df):
                       title="📈 Traffic Recovery Timeline",
                       labels={'traffic_mean': 'Average Daily Traffic', 'date': 'Date'})
         
-        fig2.add_vline(x=covid_start, line_dash="dash", line_color="red", 
+        fig2.add_vline(x=COVID_START, line_dash="dash", line_color="red", 
                       annotation_text="COVID Start")
-        fig2.add_vline(x=recovery_start, line_dash="dash", line_color="green", 
+        fig2.add_vline(x=RECOVERY_START, line_dash="dash", line_color="green", 
                       annotation_text="Recovery Phase")
         
         fig2.update_layout(height=400)
@@ -156,9 +230,10 @@ def create_covid_impact_analysis(df):
     # COVID impact metrics
     st.markdown("### 📊 COVID Impact Metrics")
     
-    pre_covid = df_analysis[df_analysis['covid_period'] == 'Pre-COVID']['traffic_mean'].mean()
-    covid_peak = df_analysis[df_analysis['covid_period'] == 'COVID Peak']['traffic_mean'].mean()
-    recovery = df_analysis[df_analysis['covid_period'] == 'Recovery']['traffic_mean'].mean()
+    kpis = stats['period_kpis']
+    pre_covid = kpis.get('Pre-COVID', np.nan)
+    covid_peak = kpis.get('COVID Peak', np.nan)
+    recovery = kpis.get('Recovery', np.nan)
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -182,7 +257,7 @@ def create_covid_impact_analysis(df):
         st.metric("Current Status", f"{current_vs_pre:.1f}%",
                  delta="vs Pre-COVID levels")
 
-def create_regional_analysis(df):
+def create_regional_analysis(df, stats):
     """Regional traffic pattern analysis"""
     st.subheader("🏙️ Regional Traffic Analysis")
     
@@ -194,13 +269,7 @@ def create_regional_analysis(df):
     
     with col1:
         # Regional traffic comparison
-        regional_stats = df.groupby('region').agg({
-            'traffic_mean': ['mean', 'max', 'std'],
-            'monthly_change_mean': 'mean'
-        }).round(1)
-        
-        regional_stats.columns = ['avg_traffic', 'peak_traffic', 'variability', 'avg_growth']
-        regional_stats = regional_stats.reset_index()
+        regional_stats = stats['regional_stats']
         
         fig1 = px.bar(regional_stats,
                      x='region',
@@ -228,17 +297,19 @@ def create_regional_analysis(df):
     # Regional insights table
     st.markdown("### 📋 Regional Performance Summary")
     
-    # Format the regional stats for display
-    display_stats = regional_stats.copy()
-    display_stats['avg_traffic'] = display_stats['avg_traffic'].apply(lambda x: f"{x:,.0f}")
-    display_stats['peak_traffic'] = display_stats['peak_traffic'].apply(lambda x: f"{x:,.0f}")
-    display_stats['variability'] = display_stats['variability'].apply(lambda x: f"{x:,.0f}")
-    display_stats['avg_growth'] = display_stats['avg_growth'].apply(lambda x: f"{x:.1f}%")
-    
-    display_stats.columns = ['Region', 'Average Traffic', 'Peak Traffic', 'Variability', 'Average Growth']
-    st.dataframe(display_stats, use_container_width=True, hide_index=True)
+    # Format for display only, keeping numeric columns so the table sorts correctly
+    display_stats = regional_stats.set_axis(
+        ['Region', 'Average Traffic', 'Peak Traffic', 'Variability', 'Average Growth'], axis=1
+    )
+    display_format = {
+        'Average Traffic': '{:,.0f}',
+        'Peak Traffic': '{:,.0f}',
+        'Variability': '{:,.0f}',
+        'Average Growth': '{:.1f}%'
+    }
+    st.dataframe(display_stats.style.format(display_format), use_container_width=True, hide_index=True)
 
-def create_road_category_analysis(df):
+def create_road_category_analysis(df, stats):
     """Road category and infrastructure analysis"""
     st.subheader("🛣️ Road Category Analysis")
     
@@ -246,11 +317,12 @@ def create_road_category_analysis(df):
         st.warning("Road category data not available")
         return
     
+    road_stats, road_trends = stats['road_stats'], stats['road_trends']
+    
     col1, col2 = st.columns(2)
     
     with col1:
         # Road category traffic distribution
-        road_stats = df.groupby('road_category')['traffic_mean'].mean().reset_index()
         
         fig1 = px.pie(road_stats,
                      values='traffic_mean',
@@ -262,8 +334,6 @@ def create_road_category_analysis(df):
     
     with col2:
         # Road category trends over time
-        road_trends = df.groupby(['date', 'road_category'])['traffic_mean'].mean().reset_index()
-        
         fig2 = px.line(road_trends,
                       x='date',
                       y='traffic_mean',
@@ -274,7 +344,7 @@ def create_road_category_analysis(df):
         fig2.update_layout(height=400)
         st.plotly_chart(fig2, use_container_width=True)
 
-def create_seasonal_analysis(df):
+def create_seasonal_analysis(df, stats):
     """Seasonal traffic pattern analysis"""
     st.subheader("🌡️ Seasonal Traffic Patterns")
     
@@ -282,11 +352,12 @@ def create_seasonal_analysis(df):
         st.warning("Seasonal data not available")
         return
     
+    seasonal_stats, monthly_pivot = stats['seasonal_stats'], stats['monthly_pivot']
+    
     col1, col2 = st.columns(2)
     
     with col1:
         # Seasonal averages
-        seasonal_stats = df.groupby(['season', 'region'])['traffic_mean'].mean().reset_index()
         
         fig1 = px.bar(seasonal_stats,
                      x='season',
@@ -300,10 +371,7 @@ def create_seasonal_analysis(df):
     
     with col2:
         # Monthly traffic heatmap
-        if 'month' in df.columns:
-            monthly_traffic = df.groupby(['month', 'region'])['traffic_mean'].mean().reset_index()
-            monthly_pivot = monthly_traffic.pivot(index='month', columns='region', values='traffic_mean')
-            
+        if monthly_pivot is not None:
             fig2 = px.imshow(monthly_pivot,
                            title="📅 Monthly Traffic Heatmap",
                            labels=dict(x="Region", y="Month", color="Traffic"),
@@ -349,7 +417,7 @@ def main():
         st.markdown("Python • Streamlit • Plotly • NVDB API")
     
     # Load data
-    df = load_processed_data()
+    df, stats = load_processed_data()
     
     if len(df) == 0:
         st.error("❌ No data available. Please ensure data processing is complete.")
@@ -388,31 +456,30 @@ def main():
     # Main traffic trend visualization
     st.subheader("📊 Traffic Volume Trends")
     
-    fig_main = go.Figure()
+    # Reshape once so every region and series is drawn from a single frame
+    series_names = {'traffic_mean': 'Monthly'}
+    if 'rolling_3m_avg' in df.columns:
+        series_names['rolling_3m_avg'] = 'Trend'
     
-    for region in df['region'].unique():
-        region_data = df[df['region'] == region]
-        fig_main.add_trace(go.Scatter(
-            x=region_data['date'],
-            y=region_data['traffic_mean'],
-            mode='lines+markers',
-            name=f'{region}',
-            line=dict(width=3),
-            marker=dict(size=6)
-        ))
+    plot_df = df[['date', 'region', *series_names]].melt(
+        id_vars=['date', 'region'], var_name='series', value_name='traffic'
+    )
+    plot_df['series'] = plot_df['series'].map(series_names)
     
-    # Add rolling average if available
-    if 'rolling_3m_avg' in df.columns:
-        for region in df['region'].unique():
-            region_data = df[df['region'] == region]
-            fig_main.add_trace(go.Scatter(
-                x=region_data['date'],
-                y=region_data['rolling_3m_avg'],
-                mode='lines',
-                name=f'{region} Trend',
-                line=dict(width=2, dash='dash'),
-                opacity=0.7
-            ))
+    fig_main = px.line(plot_df,
+                      x='date',
+                      y='traffic',
+                      color='region',
+                      line_dash='series',
+                      line_dash_map={'Monthly': 'solid', 'Trend': 'dash'},
+                      markers=True)
+    
+    # Monthly lines get markers; trend lines stay thinner, translucent and marker-free
+    fig_main.update_traces(mode='lines+markers', line_width=3, marker_size=6)
+    fig_main.for_each_trace(
+        lambda trace: trace.update(mode='lines', line_width=2, opacity=0.7),
+        selector=lambda trace: trace.name.endswith(', Trend')
+    )
     
     fig_main.update_layout(
         title="🚦 Norwegian Traffic Trends by Region (NVDB Data)",
@@ -425,16 +492,16 @@ def main():
     st.plotly_chart(fig_main, use_container_width=True)
     
     # COVID Impact Analysis
-    create_covid_impact_analysis(df)
+    create_covid_impact_analysis(df, stats)
     
     # Regional Analysis
-    create_regional_analysis(df)
+    create_regional_analysis(df, stats)
     
     # Road Category Analysis
-    create_road_category_analysis(df)
+    create_road_category_analysis(df, stats)
     
     # Seasonal Analysis
-    create_seasonal_analysis(df)
+    create_seasonal_analysis(df, stats)
     
     # Key Insights
     st.subheader("🎯 Key Insights & Policy Implications")